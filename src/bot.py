@@ -1,5 +1,7 @@
 import logging
 import asyncio
+import time
+from contextlib import asynccontextmanager
 import nest_asyncio
 import pytz
 from telegram import Update
@@ -45,6 +47,14 @@ llm = None
 response_chain = None
 conversation_memory = None
 
+# Per-chat burst coalescing state.
+pending_messages = {}  # chat_id -> [(update, sender_name, message, received_at), ...]
+pending_flushes = {}  # chat_id -> asyncio.Task waiting out the coalescing window
+chat_llm_semaphores = {}  # chat_id -> [asyncio.Semaphore limiting concurrent LLM calls, flushes using it]
+flush_tasks = set()  # strong references so running flushes aren't garbage collected
+# conversation_memory is shared by every chat, so flushes must not update it concurrently.
+conversation_memory_lock = asyncio.Lock()
+
 WAKE_WORDS = ["peacy", "pc", "peacybot", "peacyai", "peacy-ai", "peacy-bot", "peacey", "peaceybot", "peaceyai", "peacey-ai", "peacey-bot"]
 
 def contains_wake_word(text: str) -> bool:
@@ -129,39 +139,128 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     basic_profile = f"{full_name} (username: {username})" if username else full_name
     update_user_profile(user_id, username=username, profile_info=basic_profile)
 
-    # Continue with logging the message and updating conversation memory...
+    # Log the message right away; the reply itself is produced once the chat's burst window closes.
     loop = asyncio.get_event_loop()
     await loop.run_in_executor(None, log_message, chat_id, user_id, user_message)
-    await asyncio.to_thread(conversation_memory.save_context, {"input": user_message}, {"output": ""})
-    dynamic_summary = conversation_memory.load_memory_variables({})["chat_history"]
-    if isinstance(dynamic_summary, list):
-        dynamic_summary = "\n".join(str(item) for item in dynamic_summary)
-
-    retrieved = retrieve_memory(user_message, n_results=3)
-    retrieved_text = f"Relevant past interactions: {retrieved}\n" if retrieved else ""
-    persistent_summary = get_conversation_summary(chat_id)
-    combined_summary = ""
-    if persistent_summary:
-        combined_summary += f"Persistent conversation summary: {persistent_summary}\n"
-    combined_summary += retrieved_text + dynamic_summary
-
-    profile = get_user_profile(user_id)
-    if profile and profile[0]:
-        combined_summary = f"User: {profile[0]}.\n" + combined_summary
-
-    MAX_CONTEXT_LENGTH = 2048
-    if len(combined_summary) > MAX_CONTEXT_LENGTH:
-        combined_summary = combined_summary[-MAX_CONTEXT_LENGTH:]
-    logger.info(f"Conversation summary for response: {combined_summary}")
-
-    reply = await generate_response(user_message, combined_summary)
-    logger.info(f"Generated reply: {reply}")
-
-    await update.message.reply_text(reply)
-    await loop.run_in_executor(None, log_message, chat_id, "Peacy", reply)
-    await loop.run_in_executor(None, add_memory, user_message, {"role": "user"})
-    await loop.run_in_executor(None, add_memory, reply, {"role": "peacy"})
-    update_conversation_summary_in_db(chat_id, combined_summary)
+
+    received_at = time.time()
+
+    sender_name = (full_info[1] if full_info and full_info[1] else None) or extracted_name or full_name or username
+    pending_messages.setdefault(chat_id, []).append((update, sender_name, user_message, received_at))
+    if chat_id not in pending_flushes:
+        task = asyncio.create_task(flush_chat_burst(chat_id))
+        pending_flushes[chat_id] = task
+        flush_tasks.add(task)
+        task.add_done_callback(flush_tasks.discard)
+
+@asynccontextmanager
+async def chat_llm_slot(chat_id):
+    """
+    Hold one of the chat's LLM call slots. The chat's semaphore is dropped once
+    no flush is using or waiting on it, so idle chats don't accumulate entries.
+    """
+    if chat_id not in chat_llm_semaphores:
+        chat_llm_semaphores[chat_id] = [asyncio.Semaphore(config.MAX_CONCURRENT_LLM_CALLS_PER_CHAT), 0]
+    entry = chat_llm_semaphores[chat_id]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            chat_llm_semaphores.pop(chat_id, None)
+
+def build_burst_input(batch) -> str:
+    """
+    Turn a batch of (update, sender_name, message, received_at) entries into a single user input.
+    A lone message is passed through unchanged; otherwise messages are grouped by sender.
+    """
+    if len(batch) == 1:
+        return batch[0][2]
+    senders = {}
+    for update, sender, message, _ in batch:
+        senders.setdefault(update.effective_user.id, (sender, []))[1].append(message)
+    if len(senders) == 1:
+        sender, messages = next(iter(senders.values()))
+        lines = [f"- {message}" for message in messages]
+        return f"{sender} sent you several messages at once. Reply once to all of them:\n" + "\n".join(lines)
+    lines = []
+    for sender, messages in senders.values():
+        lines.append(f"- {sender}:")
+        lines.extend(f"  - {message}" for message in messages)
+    return (
+        "Several people messaged you at once. Reply once, addressing each of them by name:\n"
+        + "\n".join(lines)
+    )
+
+async def flush_chat_burst(chat_id):
+    """
+    Wait for the coalescing window, then answer every wake-word message collected
+    for the chat with one context assembly and one LLM call.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        await asyncio.sleep(config.COALESCE_WINDOW_SECONDS)
+    finally:
+        # Anything arriving from here on starts a new window.
+        pending_flushes.pop(chat_id, None)
+        batch = pending_messages.pop(chat_id, [])
+    if not batch:
+        return
+
+    try:
+        messages = [message for _, _, message, _ in batch]
+        user_input = build_burst_input(batch)
+        logger.info(f"Answering {len(batch)} message(s) in chat {chat_id}")
+
+        loop = asyncio.get_event_loop()
+        # save_context summarizes through the LLM, so it counts against the chat's limit too.
+        async with chat_llm_slot(chat_id):
+            async with conversation_memory_lock:
+                await asyncio.to_thread(conversation_memory.save_context, {"input": user_input}, {"output": ""})
+                dynamic_summary = conversation_memory.load_memory_variables({})["chat_history"]
+            if isinstance(dynamic_summary, list):
+                dynamic_summary = "\n".join(str(item) for item in dynamic_summary)
+
+            retrieved = await loop.run_in_executor(None, retrieve_memory, "\n".join(messages), 3)
+            retrieved_text = f"Relevant past interactions: {retrieved}\n" if retrieved else ""
+            persistent_summary = await loop.run_in_executor(None, get_conversation_summary, chat_id)
+            combined_summary = ""
+            if persistent_summary:
+                combined_summary += f"Persistent conversation summary: {persistent_summary}\n"
+            combined_summary += retrieved_text + dynamic_summary
+
+            user_ids = list(dict.fromkeys(update.effective_user.id for update, _, _, _ in batch))
+            usernames = []
+            for user_id in user_ids:
+                profile = await loop.run_in_executor(None, get_user_profile, user_id)
+                if profile and profile[0]:
+                    usernames.append(profile[0])
+            if usernames:
+                label = "User" if len(usernames) == 1 else "Users"
+                combined_summary = f"{label}: {', '.join(usernames)}.\n" + combined_summary
+
+            MAX_CONTEXT_LENGTH = 2048
+            if len(combined_summary) > MAX_CONTEXT_LENGTH:
+                combined_summary = combined_summary[-MAX_CONTEXT_LENGTH:]
+            logger.info(f"Conversation summary for response: {combined_summary}")
+
+            reply = await generate_response(user_input, combined_summary)
+        logger.info(f"Generated reply: {reply}")
+
+        # Thread the reply under the most recent message of the burst.
+        await batch[-1][0].message.reply_text(reply)
+        await loop.run_in_executor(None, log_message, chat_id, "Peacy", reply)
+        replied_at = time.time()
+        # chat_id/timestamp (matching when each row was logged) let snapshot.py
+        # filter memories the same way it filters messages.
+        for _, _, message, received_at in batch:
+            await loop.run_in_executor(None, add_memory, message, {"role": "user", "chat_id": chat_id, "timestamp": received_at})
+        await loop.run_in_executor(None, add_memory, reply, {"role": "peacy", "chat_id": chat_id, "timestamp": replied_at})
+        await loop.run_in_executor(None, update_conversation_summary_in_db, chat_id, combined_summary)
+    except Exception as e:
+        logger.exception(f"Error answering burst in chat {chat_id}: {e}")
 
 async def main():
     global llm, response_chain, conversation_memory
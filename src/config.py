@@ -11,5 +11,11 @@ class Config:
     PG_CONNECTION_STRING = os.environ.get("PG_CONNECTION_STRING")
     CHROMA_PERSIST_DIRECTORY = os.environ.get("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
     PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
+    # Wake-word messages arriving in the same chat within this window are answered together.
+    COALESCE_WINDOW_SECONDS = float(os.environ.get("COALESCE_WINDOW_SECONDS", "1.5"))
+    MAX_CONCURRENT_LLM_CALLS_PER_CHAT = int(os.environ.get("MAX_CONCURRENT_LLM_CALLS_PER_CHAT", "1"))
+
+if Config.MAX_CONCURRENT_LLM_CALLS_PER_CHAT < 1:
+    raise ValueError("MAX_CONCURRENT_LLM_CALLS_PER_CHAT must be at least 1")
 
 config = Config()
\ No newline at end of file
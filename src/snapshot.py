@@ -0,0 +1,289 @@
+import os
+import gzip
+import json
+import base64
+import logging
+import argparse
+from array import array
+from datetime import datetime, timezone
+
+import psycopg2
+import chromadb
+from config import config
+from db_manager import init_db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "peacy_memories"
+MANIFEST_FILE = "manifest.json"
+CHROMA_FILE = "chroma.jsonl.gz"
+
+# Column order is pinned so binary COPY files line up on import.
+TABLE_COLUMNS = {
+    "messages": ["id", "chat_id", "user_id", "message_text", "timestamp"],
+    "users": ["user_id", "username", "display_name", "location", "profile_info", "updated_at", "emotional_state"],
+    "conversation_summaries": ["chat_id", "summary"],
+}
+# Surrogate keys don't identify a row, so merges let the sequence assign fresh values.
+SURROGATE_KEYS = {"messages": "id"}
+
+def table_file(table, fmt):
+    return f"{table}.{'bin' if fmt == 'binary' else 'csv'}.gz"
+
+def copy_options(fmt):
+    return "(FORMAT binary)" if fmt == "binary" else "(FORMAT csv, HEADER true)"
+
+# messages.timestamp is a naive TIMESTAMP written in the session time zone;
+# this turns it into an absolute time comparable with UTC-aware filters.
+MESSAGE_TIME = "(timestamp AT TIME ZONE current_setting('TimeZone'))"
+
+def messages_filter(cur, chat_ids=None, since=None, until=None):
+    """Build a WHERE clause over the messages table for the given filters."""
+    clauses = []
+    if chat_ids:
+        clauses.append(cur.mogrify("chat_id = ANY(%s)", (list(chat_ids),)).decode())
+    if since:
+        clauses.append(cur.mogrify(f"{MESSAGE_TIME} >= %s", (since,)).decode())
+    if until:
+        clauses.append(cur.mogrify(f"{MESSAGE_TIME} < %s", (until,)).decode())
+    return " AND ".join(clauses)
+
+def table_query(cur, table, chat_ids=None, since=None, until=None):
+    """
+    Return the SELECT used to export a table. Users are narrowed to those who
+    wrote a matching message; summaries only honour the chat filter.
+    """
+    columns = ", ".join(TABLE_COLUMNS[table])
+    where = ""
+    if table == "messages":
+        where = messages_filter(cur, chat_ids, since, until)
+    elif table == "users" and (chat_ids or since or until):
+        where = f"user_id IN (SELECT DISTINCT user_id FROM messages WHERE {messages_filter(cur, chat_ids, since, until)})"
+    elif table == "conversation_summaries" and chat_ids:
+        where = cur.mogrify("chat_id = ANY(%s)", (list(chat_ids),)).decode()
+    query = f"SELECT {columns} FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+    return query
+
+def export_postgres(snapshot_dir, fmt="csv", chat_ids=None, since=None, until=None):
+    """Stream every table through COPY into gzip files, all from one consistent transaction."""
+    conn = psycopg2.connect(config.PG_CONNECTION_STRING)
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    cur = conn.cursor()
+    for table in TABLE_COLUMNS:
+        query = table_query(cur, table, chat_ids, since, until)
+        path = os.path.join(snapshot_dir, table_file(table, fmt))
+        with gzip.open(path, "wb", compresslevel=1) as f:
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH {copy_options(fmt)}", f)
+        logger.info(f"Exported table {table} to {path}")
+    conn.rollback()
+    cur.close()
+    conn.close()
+
+def import_postgres(snapshot_dir, fmt="csv", replace=False):
+    """
+    COPY each table into a temporary staging table, then merge it in.
+    With replace, the tables are truncated first and restored verbatim. Otherwise
+    messages get new ids, and users/summaries whose key already exists are left
+    untouched and reported as skipped.
+    """
+    init_db()
+    conn = psycopg2.connect(config.PG_CONNECTION_STRING)
+    cur = conn.cursor()
+    if replace:
+        cur.execute(f"TRUNCATE {', '.join(TABLE_COLUMNS)} RESTART IDENTITY")
+        logger.info(f"Truncated tables: {', '.join(TABLE_COLUMNS)}")
+    for table, columns in TABLE_COLUMNS.items():
+        path = os.path.join(snapshot_dir, table_file(table, fmt))
+        if not os.path.exists(path):
+            logger.info(f"No snapshot file for table {table}; skipping.")
+            continue
+        column_list = ", ".join(columns)
+        staging = f"{table}_staging"
+        cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        with gzip.open(path, "rb") as f:
+            cur.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH {copy_options(fmt)}", f)
+        cur.execute(f"SELECT COUNT(*) FROM {staging}")
+        staged = cur.fetchone()[0]
+        insert_columns = columns if replace else [c for c in columns if c != SURROGATE_KEYS.get(table)]
+        insert_list = ", ".join(insert_columns)
+        cur.execute(f"""
+            INSERT INTO {table} ({insert_list})
+            SELECT {insert_list} FROM {staging}
+            ON CONFLICT DO NOTHING
+        """)
+        skipped = staged - cur.rowcount
+        logger.info(f"Imported {cur.rowcount} rows into {table}")
+        if skipped:
+            logger.warning(f"Skipped {skipped} rows in {table} whose keys already exist; use --replace to overwrite.")
+    # Keep the messages id sequence ahead of the restored ids.
+    cur.execute("SELECT setval(pg_get_serial_sequence('messages', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM messages")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def chroma_filter(chat_ids=None, since=None, until=None):
+    """Translate the snapshot filters into a Chroma metadata `where` clause."""
+    conditions = []
+    if chat_ids:
+        conditions.append({"chat_id": {"$in": list(chat_ids)}})
+    if since:
+        conditions.append({"timestamp": {"$gte": since.timestamp()}})
+    if until:
+        conditions.append({"timestamp": {"$lt": until.timestamp()}})
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+def encode_embedding(embedding):
+    return base64.b64encode(array("f", embedding).tobytes()).decode("ascii")
+
+def decode_embedding(data):
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    return values.tolist()
+
+def collection_exists(client):
+    # list_collections returns names on newer Chroma and Collection objects on older ones.
+    return COLLECTION_NAME in [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+def export_chroma(snapshot_dir, batch_size=1000, chat_ids=None, since=None, until=None):
+    """Page through the collection and write ids, embeddings, metadata and documents as-is."""
+    if not os.path.exists(config.CHROMA_PERSIST_DIRECTORY):
+        logger.info("Chroma persistence directory not found; skipping memories.")
+        return
+    client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+    if not collection_exists(client):
+        logger.info(f"Chroma collection {COLLECTION_NAME} not found; skipping memories.")
+        return
+    collection = client.get_collection(COLLECTION_NAME)
+    where = chroma_filter(chat_ids, since, until)
+    path = os.path.join(snapshot_dir, CHROMA_FILE)
+    # Resolve the matching ids up front so paging is linear and unaffected by concurrent writes.
+    all_ids = collection.get(where=where, include=[])["ids"]
+    total = 0
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=1) as f:
+        for start in range(0, len(all_ids), batch_size):
+            batch = collection.get(
+                ids=all_ids[start:start + batch_size],
+                include=["embeddings", "metadatas", "documents"],
+            )
+            ids = batch["ids"]
+            if not ids:
+                continue
+            record = {
+                "ids": ids,
+                "embeddings": [encode_embedding(e) for e in batch["embeddings"]],
+                "metadatas": batch["metadatas"],
+                "documents": batch["documents"],
+            }
+            f.write(json.dumps(record) + "\n")
+            total += len(ids)
+    logger.info(f"Exported {total} memories to {path}")
+
+def import_chroma(snapshot_dir, replace=False):
+    """
+    Add stored embeddings directly so nothing is re-embedded. Like the Postgres
+    import, existing ids are skipped unless replace drops the collection first.
+    """
+    path = os.path.join(snapshot_dir, CHROMA_FILE)
+    if not os.path.exists(path):
+        logger.info("No Chroma snapshot file; skipping.")
+        return
+    os.makedirs(config.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+    client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+    if replace and collection_exists(client):
+        client.delete_collection(COLLECTION_NAME)
+        logger.info(f"Deleted Chroma collection: {COLLECTION_NAME}")
+    collection = client.get_or_create_collection(COLLECTION_NAME)
+    # Records follow the export --batch-size, which may exceed what Chroma accepts per call.
+    max_batch = client.get_max_batch_size()
+    total = 0
+    skipped = 0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            for start in range(0, len(record["ids"]), max_batch):
+                ids = record["ids"][start:start + max_batch]
+                existing = set(collection.get(ids=ids, include=[])["ids"])
+                keep = [start + i for i, id_ in enumerate(ids) if id_ not in existing]
+                skipped += len(ids) - len(keep)
+                if not keep:
+                    continue
+                collection.add(
+                    ids=[record["ids"][i] for i in keep],
+                    embeddings=[decode_embedding(record["embeddings"][i]) for i in keep],
+                    # Chroma rejects empty metadata dicts.
+                    metadatas=[record["metadatas"][i] or None for i in keep],
+                    documents=[record["documents"][i] for i in keep],
+                )
+                total += len(keep)
+    logger.info(f"Imported {total} memories into {COLLECTION_NAME}")
+    if skipped:
+        logger.warning(f"Skipped {skipped} memories whose ids already exist; use --replace to overwrite.")
+
+def export_snapshot(snapshot_dir, fmt="csv", batch_size=1000, chat_ids=None, since=None, until=None):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    export_postgres(snapshot_dir, fmt, chat_ids, since, until)
+    export_chroma(snapshot_dir, batch_size, chat_ids, since, until)
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "format": fmt,
+        "chat_ids": chat_ids,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Snapshot written to {snapshot_dir}")
+
+def import_snapshot(snapshot_dir, replace=False):
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    import_postgres(snapshot_dir, manifest["format"], replace)
+    import_chroma(snapshot_dir, replace)
+    logger.info(f"Snapshot restored from {snapshot_dir}")
+
+def parse_time(value):
+    """Parse an ISO 8601 time into a UTC-aware datetime; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of Postgres and Chroma state.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write a snapshot to a directory.")
+    export_parser.add_argument("snapshot_dir")
+    export_parser.add_argument("--format", choices=["csv", "binary"], default="csv",
+                               help="COPY format for Postgres tables.")
+    export_parser.add_argument("--chat-id", type=int, action="append", dest="chat_ids",
+                               help="Only export this chat (repeatable).")
+    export_parser.add_argument("--since", type=parse_time, help="Only export messages at or after this ISO time (UTC if no offset).")
+    export_parser.add_argument("--until", type=parse_time, help="Only export messages before this ISO time (UTC if no offset).")
+    export_parser.add_argument("--batch-size", type=positive_int, default=1000, help="Chroma records per batch.")
+
+    import_parser = subparsers.add_parser("import", help="Restore a snapshot from a directory.")
+    import_parser.add_argument("snapshot_dir")
+    import_parser.add_argument("--replace", action="store_true",
+                               help="Truncate the tables and drop the Chroma collection before loading.")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == "export":
+        export_snapshot(args.snapshot_dir, args.format, args.batch_size, args.chat_ids, args.since, args.until)
+    else:
+        import_snapshot(args.snapshot_dir, args.replace)